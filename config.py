@@ -46,6 +46,15 @@ LLM_MODELS = {
     #     "type": "yandex_sdk",
     #     "uri": f"gpt://{YC_FOLDER_ID}/yandexgpt/latest",
     # },
+    # Быстрая модель для маршрута "fast" (ROUTING_TIERS). Ее результаты в тестовом
+    # режиме нужны scripts/evaluate_routing.py для проверки порогов; routing_only
+    # ограничивает перебор OCR-инструментом и промптами рабочего режима, то есть
+    # добавляет по одному запросу LLM на страницу для каждого промпта маршрута.
+    "yandex_gpt_lite": {
+        "type": "yandex_sdk",
+        "uri": f"gpt://{YC_FOLDER_ID}/yandexgpt-lite/latest",
+        "routing_only": True,
+    },
     "qwen3_235b": {
         "type": "openai_compatible",
         "uri": f"gpt://{YC_FOLDER_ID}/qwen3-235b-a22b-fp8/latest",
@@ -111,3 +120,41 @@ PROMPTS = {
 PRODUCTION_OCR_TOOL = "yandex_vision_simple" # Например, "yandex_vision_bbox"
 PRODUCTION_LLM_MODEL = "qwen3_235b"        # Например, "qwen3_235b"
 PRODUCTION_PROMPT = "prompt_1"             # Например, "prompt_2"
+
+# --- Дедупликация повторных сканов ---
+# Перед OCR перцептивный хэш отсеивает заведомо разные страницы, а повторный скан
+# подтверждается совмещением уменьшенных копий страниц
+DEDUP_ENABLED = True
+# "skip" — распознается только самая резкая копия, пропущенные сканы указываются
+# на странице документа; "flag" — распознаются все копии, но помечаются в документе.
+# По умолчанию "flag": пороги проверены только на имитации, а ошибочное склеивание
+# в режиме "skip" убрало бы из документа настоящую страницу дневника.
+# Переключать на "skip" после проверки на настоящих парах пересъемки.
+DEDUP_MODE = "flag"
+# Пороги подобраны на имитации повторной съемки рабочих сканов (поворот 1-2°,
+# обрезка 1-3%, яркость ±10%, масштаб 0.5-1): у повторов расстояние хэшей до 18
+# и корреляция от 0.80, у разных страниц расстояние от 22 и корреляция не выше 0.59.
+DEDUP_MAX_HAMMING_DISTANCE = 20  # Из 64 бит хэша, только отбор кандидатов
+DEDUP_MIN_CORRELATION = 0.7
+
+# --- Каскадная маршрутизация страниц между моделями ---
+# По признакам OCR (уверенность Vision, доля словарных слов, плотность мусора)
+# страница либо не отправляется в LLM, либо идет в быструю модель, либо в полную.
+# Выключено, пока пороги не откалиброваны: на эталонах results/ideal_result все
+# страницы уходят в "full", а для быстрой модели еще нет результатов тестового режима.
+# Порядок включения: прогнать тестовый режим (с yandex_gpt_lite), затем
+# python scripts/evaluate_routing.py и подобрать пороги по его сводке.
+ROUTING_ENABLED = False
+ROUTING_TIERS = {
+    "fast": {"llm": "yandex_gpt_lite", "prompt": PRODUCTION_PROMPT},
+    "full": {"llm": PRODUCTION_LLM_MODEL, "prompt": PRODUCTION_PROMPT},
+}
+# Пороги в порядке от дешевого маршрута к дорогому; если ни один не выполнен — "full".
+# Начальные значения, не проверенные на данных. "skip" выбирается только при
+# заданном словаре: ни эвристика доли слов, ни непроверенная уверенность OCR
+# не достаточны, чтобы писать сырой OCR в дневник.
+ROUTING_THRESHOLDS = {
+    "skip": {"min_confidence": 0.97, "min_word_ratio": 0.98, "max_artifact_density": 0.005},
+    "fast": {"min_confidence": 0.90, "min_word_ratio": 0.96, "max_artifact_density": 0.03},
+}
+ROUTING_DICTIONARY_FILE = None  # Например, DATA_DIR / "dictionary_ru.txt"; без словаря — эвристика
@@ -2,6 +2,7 @@ import argparse
 import logging
 import itertools
 import re
+import time
 from pathlib import Path
 
 import config
@@ -10,7 +11,9 @@ from src.ocr.yandex_vision_ocr import YandexVisionOCR
 from src.ocr.rehand_mock_ocr import RehandMockOCR
 from src.llm.yandex_cloud_llm import YandexCloudLLM
 from src.llm.openai_compatible_llm import OpenAICompatibleLLM # <-- Импортируем новый класс
+from src.llm.router import TIER_FULL, TIER_SKIP, choose_tier, compute_text_signals, light_cleanup, load_dictionary
 from src.document_generator.word import create_word_document
+from src.preprocessing.dedup import deduplicate_scans
 
 def _extract_page_number(path: Path) -> int:
     """Извлекает число из имени файла для корректной сортировки."""
@@ -20,6 +23,45 @@ def _extract_page_number(path: Path) -> int:
     # Возвращаем 0 или другое значение по умолчанию, если число не найдено
     return 0
 
+def _with_note(page_text: str, note: str | None) -> str:
+    """Добавляет в начало страницы пометку (в документе оформляется цитатой)."""
+    return f"> {note}\n\n{page_text}" if note else page_text
+
+def _plan_scans(scans: list[Path]) -> list[tuple[Path, Path, str | None]]:
+    """
+    Определяет, какие сканы распознавать, с учетом повторных сканов страниц.
+    :return: Список (скан, задающий номер страницы; скан для OCR; пометка для документа).
+    """
+    if not config.DEDUP_ENABLED:
+        return [(image_path, image_path, None) for image_path in scans]
+    if config.DEDUP_MODE not in ("skip", "flag"):
+        raise ValueError(f"Неизвестный режим дедупликации: {config.DEDUP_MODE}. Допустимы 'skip' и 'flag'")
+
+    groups = deduplicate_scans(scans, config.DEDUP_MAX_HAMMING_DISTANCE, config.DEDUP_MIN_CORRELATION)
+    plan = []
+    for page_path, best_path, duplicates in groups:
+        if not duplicates:
+            plan.append((page_path, best_path, None))
+        elif config.DEDUP_MODE == "skip":
+            skipped = ", ".join(p.name for p in duplicates)
+            plan.append((page_path, best_path, f"Повторные сканы пропущены: {skipped} (распознан {best_path.name})"))
+        else:
+            group = [best_path] + duplicates
+            for image_path in group:
+                others = ", ".join(p.name for p in group if p != image_path)
+                plan.append((image_path, image_path, f"Возможный повторный скан: та же страница в {others}"))
+    return sorted(plan, key=lambda item: _extract_page_number(item[0]))
+
+def _is_test_combination(ocr_name: str, llm_name: str, prompt_name: str) -> bool:
+    """
+    Модели только для маршрутизации (routing_only) проверяются лишь в тех
+    сочетаниях, в которых их использует рабочий режим.
+    """
+    if not config.LLM_MODELS[llm_name].get("routing_only"):
+        return True
+    routing_prompts = {spec["prompt"] for spec in config.ROUTING_TIERS.values() if spec["llm"] == llm_name}
+    return ocr_name == config.PRODUCTION_OCR_TOOL and prompt_name in routing_prompts
+
 def get_ocr_processor(tool_name: str):
     """Фабрика для создания OCR процессоров."""
     tool_config = config.OCR_TOOLS.get(tool_name)
@@ -59,11 +101,14 @@ def run_test_mode():
 
     config.TEST_OUTPUTS_DIR.mkdir(exist_ok=True)
     
-    combinations = list(itertools.product(
-        config.OCR_TOOLS.keys(),
-        config.LLM_MODELS.keys(),
-        config.PROMPTS.keys()
-    ))
+    combinations = [
+        combination for combination in itertools.product(
+            config.OCR_TOOLS.keys(),
+            config.LLM_MODELS.keys(),
+            config.PROMPTS.keys()
+        )
+        if _is_test_combination(*combination)
+    ]
     
     logging.info(f"Всего сканов для теста: {len(test_scans)}")
     logging.info(f"Всего комбинаций для проверки: {len(combinations)}")
@@ -72,6 +117,9 @@ def run_test_mode():
         page_name = image_path.stem
         logging.info(f"--- Обработка страницы {page_name} ---")
         
+        # OCR не зависит от LLM и промпта, поэтому каждый инструмент вызывается один раз на страницу
+        ocr_results = {}
+
         rehand_text_path = config.REHAND_MOCK_TEXTS_DIR / f"{page_name}.txt"
         if "rehand_mock" in config.OCR_TOOLS and not rehand_text_path.exists():
              logging.warning(f"Мок-файл {rehand_text_path} не найден, комбинации с rehand_mock будут пропущены для этой страницы.")
@@ -86,8 +134,10 @@ def run_test_mode():
             
             try:
                 # 1. Распознавание текста (OCR)
-                ocr_processor = get_ocr_processor(ocr_name)
-                raw_text = ocr_processor.recognize(str(image_path))
+                if ocr_name not in ocr_results:
+                    ocr_processor = get_ocr_processor(ocr_name)
+                    ocr_results[ocr_name] = (ocr_processor.recognize(str(image_path)), ocr_processor.last_confidence)
+                raw_text, ocr_confidence = ocr_results[ocr_name]
                 if not raw_text or raw_text.strip().startswith("[ОШИБКА"):
                     logging.error(f"Не удалось распознать текст для {page_name}. Пропуск комбинации.")
                     continue
@@ -103,7 +153,9 @@ def run_test_mode():
                 
                 with open(output_path, 'w', encoding='utf-8') as f:
                     f.write(f"# Результат для страницы {page_name}\n")
-                    f.write(f"# Комбинация: {current_combination}\n\n")
+                    f.write(f"# Комбинация: {current_combination}\n")
+                    # Уверенность OCR нужна scripts/evaluate_routing.py для проверки порогов маршрутизации
+                    f.write(f"# Уверенность OCR: {'нет' if ocr_confidence is None else f'{ocr_confidence:.4f}'}\n\n")
                     f.write("--- СЫРОЙ ТЕКСТ OCR ---\n")
                     f.write(raw_text + "\n\n")
                     f.write("--- ОБРАБОТАННЫЙ ТЕКСТ LLM ---\n")
@@ -125,40 +177,84 @@ def run_production_mode():
         return
         
     logging.info(f"Найдено {len(prod_scans)} страниц для обработки.")
-    logging.info(f"Используемая конфигурация: OCR={config.PRODUCTION_OCR_TOOL}, LLM={config.PRODUCTION_LLM_MODEL}, Prompt={config.PRODUCTION_PROMPT}")
+
+    try:
+        scan_plan = _plan_scans(prod_scans)
+    except ValueError as e:
+        logging.critical(f"Ошибка настройки дедупликации: {e}")
+        return
+    if len(scan_plan) < len(prod_scans):
+        logging.info(f"Пропущено повторных сканов: {len(prod_scans) - len(scan_plan)}. Осталось {len(scan_plan)} страниц.")
+
+    if config.ROUTING_ENABLED:
+        tiers_description = ", ".join(f"{tier}: LLM={spec['llm']}, Prompt={spec['prompt']}" for tier, spec in config.ROUTING_TIERS.items())
+        logging.info(f"Используемая конфигурация: OCR={config.PRODUCTION_OCR_TOOL}, каскадная маршрутизация ({tiers_description})")
+    else:
+        logging.info(f"Используемая конфигурация: OCR={config.PRODUCTION_OCR_TOOL}, LLM={config.PRODUCTION_LLM_MODEL}, Prompt={config.PRODUCTION_PROMPT}")
 
     try:
         ocr_processor = get_ocr_processor(config.PRODUCTION_OCR_TOOL)
-        llm_processor = get_llm_processor(config.PRODUCTION_LLM_MODEL)
-        prompt_template = config.PROMPTS[config.PRODUCTION_PROMPT]
+        if config.ROUTING_ENABLED:
+            llm_tiers = {
+                tier: (get_llm_processor(spec["llm"]), config.PROMPTS[spec["prompt"]])
+                for tier, spec in config.ROUTING_TIERS.items()
+            }
+            unknown_tiers = set(config.ROUTING_THRESHOLDS) - set(llm_tiers) - {TIER_SKIP}
+            if unknown_tiers or TIER_FULL not in llm_tiers:
+                raise ValueError(f"Маршруты без модели в ROUTING_TIERS: {unknown_tiers or {TIER_FULL}}")
+            dictionary = load_dictionary(config.ROUTING_DICTIONARY_FILE)
+        else:
+            llm_tiers = {TIER_FULL: (get_llm_processor(config.PRODUCTION_LLM_MODEL), config.PROMPTS[config.PRODUCTION_PROMPT])}
     except (ValueError, NotImplementedError) as e:
         logging.critical(f"Ошибка инициализации процессоров: {e}")
         return
 
     all_pages_data = []
+    tier_timings = {}
+    tier_tokens = {}
     
-    for i, image_path in enumerate(prod_scans):
-        page_name = image_path.stem
-        page_num = _extract_page_number(image_path)
-        logging.info(f"Обработка страницы {i+1}/{len(prod_scans)} (файл: {image_path.name})...")
+    for i, (page_path, image_path, note) in enumerate(scan_plan):
+        page_name = page_path.stem
+        page_num = _extract_page_number(page_path)
+        logging.info(f"Обработка страницы {i+1}/{len(scan_plan)} (файл: {image_path.name})...")
         
         try:
             raw_text = ocr_processor.recognize(str(image_path))
             if not raw_text or raw_text.strip().startswith("[ОШИБКА"):
                 logging.error(f"Не удалось распознать текст для {page_name}. Страница будет пропущена.")
-                all_pages_data.append((page_num, f"#[ОШИБКА: Не удалось обработать страницу {page_name}]"))
+                all_pages_data.append((page_num, _with_note(f"#[ОШИБКА: Не удалось обработать страницу {page_name}]", note)))
                 continue
 
-            formatted_text = llm_processor.correct_and_format(raw_text, prompt_template)
-            all_pages_data.append((page_num, formatted_text))
+            tier = TIER_FULL
+            if config.ROUTING_ENABLED:
+                signals = compute_text_signals(raw_text, dictionary)
+                signals["confidence"] = ocr_processor.last_confidence
+                tier = choose_tier(signals, config.ROUTING_THRESHOLDS)
+                logging.info(f"Маршрут для {page_name}: {tier} (признаки: {signals})")
+
+            started = time.perf_counter()
+            if tier == TIER_SKIP:
+                formatted_text = light_cleanup(raw_text)
+            else:
+                llm_processor, prompt_template = llm_tiers[tier]
+                formatted_text = llm_processor.correct_and_format(raw_text, prompt_template)
+                if llm_processor.last_usage:
+                    tier_tokens.setdefault(tier, []).append(sum(llm_processor.last_usage.values()))
+            tier_timings.setdefault(tier, []).append(time.perf_counter() - started)
+            all_pages_data.append((page_num, _with_note(formatted_text, note)))
             
         except Exception as e:
             logging.error(f"Критическая ошибка при обработке файла {image_path}: {e}", exc_info=True)
-            all_pages_data.append((page_num, f"#[ОШИБКА: Не удалось обработать страницу {page_name} из-за внутренней ошибки]"))
+            all_pages_data.append((page_num, _with_note(f"#[ОШИБКА: Не удалось обработать страницу {page_name} из-за внутренней ошибки]", note)))
 
     # Собираем все в один Word файл
     output_docx_path = config.PRODUCTION_OUTPUT_DIR / "diary.docx"
     create_word_document(all_pages_data, output_docx_path)
+
+    for tier, timings in tier_timings.items():
+        tokens = tier_tokens.get(tier)
+        tokens_info = f", в среднем {sum(tokens) / len(tokens):.0f} токенов на страницу" if tokens else ""
+        logging.info(f"Маршрут {tier}: {len(timings)} стр., среднее время коррекции {sum(timings) / len(timings):.1f} с{tokens_info}")
     
     logging.info("--- Работа завершена ---")
 
@@ -0,0 +1,152 @@
+import re
+import sys
+import difflib
+from pathlib import Path
+
+# Скрипт запускается из scripts/, поэтому добавляем корень проекта в путь
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BASE_DIR / ".."))
+
+import config
+from src.llm.router import TIER_SKIP, choose_tier, compute_text_signals, light_cleanup, load_dictionary
+from rank_results import extract_processed_text, normalize_text
+
+# --- КОНСТАНТЫ ---
+IDEAL_DIR = BASE_DIR / ".." / "results" / "ideal_result"
+TEST_OUTPUTS_DIR = BASE_DIR / ".." / "results" / "test_outputs"
+RAW_MARKER = "--- СЫРОЙ ТЕКСТ OCR ---"
+RESULT_MARKER = "--- ОБРАБОТАННЫЙ ТЕКСТ LLM ---"
+CONFIDENCE_PATTERN = re.compile(r'^# Уверенность OCR: ([\d.]+)$', re.MULTILINE)
+
+def extract_raw_text(filepath: Path) -> str | None:
+    """Извлекает сырой текст OCR из файла результата тестового режима."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if RAW_MARKER not in content:
+        return None
+    return content.split(RAW_MARKER)[1].split(RESULT_MARKER)[0].strip()
+
+def extract_confidence(filepath: Path) -> float | None:
+    """Извлекает уверенность OCR из заголовка файла результата (если тестовый режим ее записал)."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        match = CONFIDENCE_PATTERN.search(f.read())
+    return float(match.group(1)) if match else None
+
+def similarity(ideal_text: str, text: str) -> float:
+    return difflib.SequenceMatcher(None, normalize_text(ideal_text), normalize_text(text)).ratio()
+
+def evaluate_routing():
+    """
+    Проверяет пороги маршрутизации на эталонных страницах: для каждой страницы
+    показывает признаки, выбранный маршрут и качество каждого варианта обработки.
+    """
+    ideal_files = sorted(IDEAL_DIR.glob("ideal_*.md"))
+    if not ideal_files:
+        print(f"ОШИБКА: Эталонные файлы не найдены в {IDEAL_DIR}")
+        return
+
+    dictionary = load_dictionary(config.ROUTING_DICTIONARY_FILE)
+    tier_models = {tier: spec["llm"] for tier, spec in config.ROUTING_TIERS.items()}
+    ocr_name = config.PRODUCTION_OCR_TOOL
+
+    print(f"OCR: {ocr_name}, маршруты: {tier_models}")
+    print(f"Пороги: {config.ROUTING_THRESHOLDS}\n")
+
+    # маршрут -> список (страница, схожесть выбранного варианта или None, потеря относительно лучшего)
+    tier_pages = {tier: [] for tier in [TIER_SKIP, *tier_models]}
+    models_with_results = set()
+    pages_with_confidence = 0
+
+    for ideal_path in ideal_files:
+        match = re.search(r'\d+', ideal_path.stem)
+        if not match:
+            continue
+        page_name = f"List_{match.group(0)}"
+
+        with open(ideal_path, 'r', encoding='utf-8') as f:
+            ideal_text = f.read()
+
+        # page_<страница>__<ocr>__<llm>__<prompt>.md
+        result_files = [
+            p for p in TEST_OUTPUTS_DIR.glob(f"page_{page_name}__{ocr_name}__*.md")
+            if p.stem.split("__")[3] in {spec["prompt"] for spec in config.ROUTING_TIERS.values()}
+        ]
+        if not result_files:
+            print(f"--- {page_name}: нет результатов тестового режима для {ocr_name}, пропуск ---\n")
+            continue
+
+        raw_text = extract_raw_text(result_files[0])
+        if not raw_text:
+            print(f"--- {page_name}: не найден сырой текст OCR, пропуск ---\n")
+            continue
+
+        signals = compute_text_signals(raw_text, dictionary)
+        signals["confidence"] = extract_confidence(result_files[0])
+        tier = choose_tier(signals, config.ROUTING_THRESHOLDS)
+        pages_with_confidence += signals["confidence"] is not None
+
+        print(f"--- {page_name} ---")
+        confidence = "нет" if signals["confidence"] is None else f"{signals['confidence']:.2%}"
+        print(f"Доля словарных слов: {signals['word_ratio']:.2%}, плотность мусора: {signals['artifact_density']:.2%}, уверенность OCR: {confidence}")
+        print(f"Выбранный маршрут: {tier}")
+
+        scores = {TIER_SKIP: similarity(ideal_text, light_cleanup(raw_text))}
+        for filepath in result_files:
+            llm_name = filepath.stem.split("__")[2]
+            processed = extract_processed_text(filepath)
+            if processed:
+                scores[llm_name] = max(scores.get(llm_name, 0.0), similarity(ideal_text, processed))
+                models_with_results.add(llm_name)
+
+        chosen = TIER_SKIP if tier == TIER_SKIP else tier_models.get(tier)
+        best = max(scores.values())
+        for name, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+            mark = " <- маршрут" if name == chosen else ""
+            print(f"  {name:20} Схожесть: {score:.2%}{mark}")
+        if chosen in scores:
+            print(f"Потеря качества относительно лучшего варианта: {best - scores[chosen]:.2%}")
+            tier_pages.setdefault(tier, []).append((page_name, scores[chosen], best - scores[chosen]))
+        else:
+            print(f"Для модели {chosen} нет результатов тестового режима.")
+            tier_pages.setdefault(tier, []).append((page_name, None, None))
+        print()
+
+    print_summary(tier_pages, tier_models, models_with_results, dictionary is not None, pages_with_confidence)
+
+def print_summary(
+    tier_pages: dict, tier_models: dict, models_with_results: set, dictionary_used: bool, pages_with_confidence: int
+):
+    """Печатает сводку по маршрутам и предупреждает о порогах, которые не были проверены."""
+    print("--- СВОДКА ПО МАРШРУТАМ ---\n")
+    for tier, pages in tier_pages.items():
+        scored = [(score, loss) for _, score, loss in pages if score is not None]
+        line = f"{tier:6} страниц: {len(pages)}"
+        if scored:
+            line += (
+                f", средняя схожесть: {sum(s for s, _ in scored) / len(scored):.2%}"
+                f", средняя потеря: {sum(l for _, l in scored) / len(scored):.2%}"
+            )
+        print(line)
+
+    print()
+    warnings = []
+    for tier, pages in tier_pages.items():
+        if not pages:
+            warnings.append(f"На маршрут '{tier}' не попала ни одна эталонная страница — его пороги не проверены.")
+    for tier, model in tier_models.items():
+        if model not in models_with_results:
+            warnings.append(f"Для модели '{model}' (маршрут '{tier}') нет результатов тестового режима — качество маршрута не оценено.")
+    if not dictionary_used:
+        warnings.append("Словарь не задан (ROUTING_DICTIONARY_FILE): маршрут 'skip' выбран быть не может.")
+    if not pages_with_confidence:
+        warnings.append("В результатах тестового режима нет уверенности OCR — порог min_confidence не проверен.")
+
+    if warnings:
+        for warning in warnings:
+            print(f"ПРЕДУПРЕЖДЕНИЕ: {warning}")
+    else:
+        print("Все маршруты проверены на эталонных страницах.")
+
+
+if __name__ == "__main__":
+    evaluate_routing()
@@ -3,6 +3,10 @@ from abc import ABC, abstractmethod
 class BaseLLM(ABC):
     """Абстрактный базовый класс для всех LLM."""
 
+    # Расход токенов последнего запроса {"prompt_tokens", "completion_tokens"}
+    # или None, если модель его не сообщила
+    last_usage: dict | None = None
+
     @abstractmethod
     def correct_and_format(self, ocr_text: str, prompt_template: str) -> str:
         """
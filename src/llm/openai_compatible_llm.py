@@ -21,6 +21,7 @@ class OpenAICompatibleLLM(BaseLLM):
 
     def correct_and_format(self, ocr_text: str, prompt_template: str) -> str:
         logging.info("Отправка текста в LLM (OpenAI-совместимый) для коррекции...")
+        self.last_usage = None
         try:
             if '{{OCR_TEXT}}' not in prompt_template:
                  raise ValueError("Промпт должен содержать маркер {{OCR_TEXT}}")
@@ -42,6 +43,12 @@ class OpenAICompatibleLLM(BaseLLM):
             )
             
             corrected_text = response.choices[0].message.content
+            if response.usage:
+                self.last_usage = {
+                    "prompt_tokens": response.usage.prompt_tokens,
+                    "completion_tokens": response.usage.completion_tokens,
+                }
+                logging.info(f"Токены: запрос {response.usage.prompt_tokens}, ответ {response.usage.completion_tokens}.")
             logging.info("Текст успешно обработан LLM (OpenAI-совместимый).")
             return corrected_text
 
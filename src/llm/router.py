@@ -0,0 +1,139 @@
+import logging
+import re
+from pathlib import Path
+
+# Маршруты в порядке от самого дешевого к самому дорогому
+TIER_SKIP = "skip"
+TIER_FAST = "fast"
+TIER_FULL = "full"
+
+CYRILLIC = set("абвгдеёжзийклмнопрстуфхцчшщъыьэюя")
+LATIN = set("abcdefghijklmnopqrstuvwxyz")
+VOWELS = set("аеёиоуыэюяaeiouy")
+# Буквы дореформенной орфографии: в дневнике 90-х их нет, это типичный мусор OCR
+PRE_REFORM = set("іѣѳѵ")
+# Однобуквенные слова и сокращение "г." (год)
+SINGLE_LETTER_WORDS = set("авикосуяжбг")
+EDGE_PUNCTUATION = ".,;:!?()[]«»“”„\"'…-–—"
+
+
+def load_dictionary(path: str | Path | None) -> set[str] | None:
+    """Загружает словарь (одно слово на строку). Возвращает None, если словарь не задан."""
+    if not path:
+        return None
+    path = Path(path)
+    if not path.exists():
+        logging.warning(f"Словарь для маршрутизации не найден: {path}. Используется эвристика.")
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.strip().lower() for line in f if line.strip()}
+
+
+def _is_plausible_word(word: str) -> bool:
+    """Эвристика: похоже ли слово на нормальное русское (или латинское) слово."""
+    # Сокращения ("т.е", "т.д", "и.т.п") и римские числа ("xx", "xiv")
+    if re.fullmatch(r'(?:[а-яё]{1,3}\.)+[а-яё]{1,3}|[ivxlcdm]+|х+', word):
+        return True
+    letters = set(word.replace('-', ''))
+    if not letters or not (letters <= CYRILLIC or letters <= LATIN):
+        return False
+    if len(word) == 1:
+        return word in SINGLE_LETTER_WORDS
+    if not letters & VOWELS or word.endswith('ъ'):
+        return False
+    return re.search(r'(.)\1\1', word) is None
+
+
+def _is_artifact(token: str) -> bool:
+    """
+    Токен явно испорчен OCR: смесь алфавитов, цифр и букв, дореформенные или мусорные символы.
+    Ожидает токен без пунктуации по краям.
+    """
+    has_digit = any(c.isdigit() for c in token)
+    has_alpha = any(c.isalpha() for c in token)
+    # Даты и числительные дневника: "5-го", "15-ое", "1993г", "1991-1998гг", "90-х"
+    if has_digit and has_alpha and not re.fullmatch(r'\d+(?:-\d+)?-?(?:го|ого|ое|ая|ые|е|й|я|х|м|ом|ым|г|гг)', token):
+        return True
+    # "<unk>" — нераспознанный фрагмент в ответе Vision
+    if set(token) & PRE_REFORM or '�' in token or '<' in token or '>' in token:
+        return True
+    letters = {c for c in token if c.isalpha()}
+    if letters & CYRILLIC and letters & LATIN:
+        return True
+    return bool(token) and not has_alpha and not has_digit and len(token) > 1
+
+
+def compute_text_signals(text: str, dictionary: set[str] | None = None) -> dict:
+    """
+    Считает признаки качества OCR-текста для выбора маршрута.
+    :param text: Сырой текст от OCR.
+    :param dictionary: Словарь допустимых слов; без него используется эвристика.
+    :return: {"word_ratio": доля словарных слов, "artifact_density": доля мусорных токенов,
+             "dictionary_used": проверялись ли слова по словарю, а не эвристикой}.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    # Токены без пунктуации по краям; чистая пунктуация ("...", "?!", "--") не считается
+    tokens = [token.lower().strip(EDGE_PUNCTUATION) for line in lines for token in line.split()]
+    tokens = [token for token in tokens if token]
+    if not tokens:
+        return {"word_ratio": 0.0, "artifact_density": 1.0, "dictionary_used": dictionary is not None}
+
+    words = []
+    artifacts = 0
+    for token in tokens:
+        if _is_artifact(token):
+            artifacts += 1
+        elif any(c.isalpha() for c in token) and not any(c.isdigit() for c in token):
+            words.append(token)
+
+    if dictionary is not None:
+        known = sum(1 for word in words if word in dictionary)
+    else:
+        known = sum(1 for word in words if _is_plausible_word(word))
+
+    # Повторяющиеся многословные строки — характерные "фантомные" фразы OCR
+    line_counts = {}
+    for line in lines:
+        key = line.lower()
+        line_counts[key] = line_counts.get(key, 0) + 1
+    repeated = sum(len(line.split()) for line in lines if len(line.split()) > 1 and line_counts[line.lower()] > 1)
+
+    return {
+        "word_ratio": known / len(words) if words else 0.0,
+        "artifact_density": min(1.0, (artifacts + repeated) / len(tokens)),
+        "dictionary_used": dictionary is not None,
+    }
+
+
+def choose_tier(signals: dict, thresholds: dict) -> str:
+    """
+    Выбирает самый дешевый маршрут, пороги которого выполнены.
+
+    Эвристика доли слов не отличает правдоподобные ошибки OCR ("женерь") от
+    настоящих слов, а уверенность OCR пока не проверена на эталонах, поэтому
+    без словаря страница никогда не пропускает LLM.
+    :param signals: Признаки страницы (word_ratio, artifact_density, dictionary_used
+                    и, если есть, confidence).
+    :param thresholds: {маршрут: {"min_confidence", "min_word_ratio", "max_artifact_density"}}
+                       в порядке от дешевого к дорогому.
+    :return: Имя маршрута; TIER_FULL, если ни один порог не выполнен.
+    """
+    confidence = signals.get("confidence")
+    for tier, limits in thresholds.items():
+        if tier == TIER_SKIP and not signals.get("dictionary_used"):
+            continue
+        # Если OCR не вернул уверенность, решаем только по тексту
+        if confidence is not None and confidence < limits.get("min_confidence", 0.0):
+            continue
+        if signals["word_ratio"] < limits.get("min_word_ratio", 0.0):
+            continue
+        if signals["artifact_density"] > limits.get("max_artifact_density", 1.0):
+            continue
+        return tier
+    return TIER_FULL
+
+
+def light_cleanup(text: str) -> str:
+    """Минимальная чистка текста для страниц, которые не отправляются в LLM."""
+    paragraphs = re.split(r'\n\s*\n', text)
+    return "\n\n".join(" ".join(p.split()) for p in paragraphs if p.strip())
@@ -20,6 +20,7 @@ class YandexCloudLLM(BaseLLM):
 
     def correct_and_format(self, ocr_text: str, prompt_template: str) -> str:
         logging.info("Отправка текста в LLM для коррекции...")
+        self.last_usage = None
         try:
             # Разделяем системный промпт и пользовательский контент
             if '{{OCR_TEXT}}' not in prompt_template:
@@ -38,6 +39,12 @@ class YandexCloudLLM(BaseLLM):
             result = self.model.run(messages)
             
             corrected_text = result.alternatives[0].text
+            if result.usage:
+                self.last_usage = {
+                    "prompt_tokens": result.usage.input_text_tokens,
+                    "completion_tokens": result.usage.completion_tokens,
+                }
+                logging.info(f"Токены: запрос {result.usage.input_text_tokens}, ответ {result.usage.completion_tokens}.")
             logging.info("Текст успешно обработан LLM.")
             return corrected_text
 
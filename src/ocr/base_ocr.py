@@ -3,6 +3,10 @@ from abc import ABC, abstractmethod
 class BaseOCR(ABC):
     """Абстрактный базовый класс для всех OCR процессоров."""
 
+    # Средняя уверенность распознавания последней страницы (0..1) или None,
+    # если инструмент ее не сообщает
+    last_confidence: float | None = None
+
     @abstractmethod
     def recognize(self, image_path: str) -> str:
         """
@@ -21,6 +21,18 @@ class YandexVisionOCR(BaseOCR):
         }
         self.processing_method = processing_method
 
+    def _extract_confidence(self, response_data: dict) -> float | None:
+        """Усредняет уверенность по строкам (или словам) ответа, если API ее вернул."""
+        values = []
+        blocks = response_data.get('result', {}).get('textAnnotation', {}).get('blocks', [])
+        for block in blocks:
+            for line in block.get('lines', []):
+                if 'confidence' in line:
+                    values.append(float(line['confidence']))
+                else:
+                    values.extend(float(word['confidence']) for word in line.get('words', []) if 'confidence' in word)
+        return sum(values) / len(values) if values else None
+
     def _process_with_bbox(self, response_data: dict) -> str:
         """Собирает текст на основе Bounding Boxes для сохранения абзацев."""
         try:
@@ -65,6 +77,7 @@ class YandexVisionOCR(BaseOCR):
 
     def recognize(self, image_path: str) -> str:
         logging.info(f"Распознавание файла {image_path} с помощью Yandex Vision (метод: {self.processing_method})...")
+        self.last_confidence = None
         try:
             with open(image_path, "rb") as f:
                 image_data = f.read()
@@ -91,6 +104,8 @@ class YandexVisionOCR(BaseOCR):
                 logging.error(f"В ответе API Yandex Vision отсутствует ключ 'result'. Ответ: {response_data}")
                 return ""
 
+            self.last_confidence = self._extract_confidence(response_data)
+
             if self.processing_method == 'bbox':
                 return self._process_with_bbox(response_data)
             
@@ -0,0 +1,215 @@
+import logging
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from PIL import Image, ImageFilter, ImageOps
+
+HASH_SIZE = 8
+# Во сколько раз исходная картинка для DCT больше итогового хэша
+HIGHFREQ_FACTOR = 4
+# Максимальная сторона изображения при оценке резкости, чтобы сканы
+# разного разрешения сравнивались на равных
+SHARPNESS_MAX_SIDE = 1024
+# Копии, резкость которых отличается от лучшей не больше чем на эту долю,
+# считаются одинаково резкими, и из них выбирается копия с большим разрешением
+SHARPNESS_TOLERANCE = 0.05
+# От краев кадра перед хэшированием и совмещением отрезается ALIGN_CROP: поля и
+# фон вокруг страницы сильнее всего меняются при пересъемке.
+# Параметры проверки кандидатов совмещением миниатюр: перебираются повороты до ALIGN_MAX_ANGLE градусов и сдвиги
+# до ALIGN_MAX_SHIFT пикселей миниатюры
+ALIGN_SIZE = 64
+ALIGN_CROP = 0.1
+ALIGN_MAX_ANGLE = 3.0
+ALIGN_ANGLE_STEP = 0.5
+ALIGN_MAX_SHIFT = ALIGN_SIZE // 10
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Строит матрицу одномерного DCT-II размера size x size."""
+    k = np.arange(size).reshape(-1, 1)
+    n = np.arange(size).reshape(1, -1)
+    return np.cos(np.pi * (2 * n + 1) * k / (2 * size))
+
+
+def _central_crop(img: Image.Image) -> Image.Image:
+    """Центральная часть скана в оттенках серого с выровненным контрастом (без полей и краев кадра)."""
+    gray = ImageOps.autocontrast(img.convert("L"))
+    width, height = gray.size
+    return gray.crop((
+        int(width * ALIGN_CROP), int(height * ALIGN_CROP),
+        int(width * (1 - ALIGN_CROP)), int(height * (1 - ALIGN_CROP)),
+    ))
+
+
+def compute_phash(image_path: str | Path) -> int:
+    """
+    Вычисляет перцептивный хэш (pHash) центральной части скана.
+    :param image_path: Путь к файлу изображения.
+    :return: 64-битный хэш в виде целого числа.
+    """
+    img_size = HASH_SIZE * HIGHFREQ_FACTOR
+    with Image.open(image_path) as img:
+        pixels = np.asarray(_central_crop(img).resize((img_size, img_size), Image.LANCZOS), dtype=np.float64)
+
+    dct = _dct_matrix(img_size)
+    low_freq = (dct @ pixels @ dct.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    # Постоянная составляющая отражает только общую яркость, в медиану ее не берем
+    median = np.median(low_freq[1:])
+
+    phash = 0
+    for bit in low_freq > median:
+        phash = (phash << 1) | int(bit)
+    return phash
+
+
+def compute_sharpness(image_path: str | Path, size: tuple[int, int]) -> float:
+    """
+    Оценивает резкость скана как дисперсию лапласиана (чем больше, тем резче).
+    :param size: Размер, к которому приводится изображение. Дисперсия лапласиана
+                 зависит от разрешения, поэтому сравнивать можно только сканы,
+                 приведенные к одному размеру.
+    """
+    with Image.open(image_path) as img:
+        pixels = np.asarray(img.convert("L").resize(size, Image.LANCZOS), dtype=np.float64)
+
+    laplacian = (
+        pixels[:-2, 1:-1] + pixels[2:, 1:-1] + pixels[1:-1, :-2] + pixels[1:-1, 2:]
+        - 4 * pixels[1:-1, 1:-1]
+    )
+    return float(laplacian.var())
+
+
+def _common_size(image_paths: list[Path]) -> tuple[int, int]:
+    """Размер самой маленькой копии, но не больше SHARPNESS_MAX_SIDE по большей стороне."""
+    sizes = []
+    for image_path in image_paths:
+        with Image.open(image_path) as img:
+            sizes.append(img.size)
+    width, height = min(sizes, key=lambda size: size[0] * size[1])
+    scale = min(1.0, SHARPNESS_MAX_SIDE / max(width, height))
+    return max(3, int(width * scale)), max(3, int(height * scale))
+
+
+def _alignment_thumbnail(image_path: str | Path) -> np.ndarray:
+    """Уменьшенная копия центральной части скана с выровненным контрастом."""
+    with Image.open(image_path) as img:
+        gray = _central_crop(img).resize((ALIGN_SIZE, ALIGN_SIZE), Image.LANCZOS).filter(ImageFilter.GaussianBlur(1))
+    return np.asarray(gray, dtype=np.float64)
+
+
+def alignment_score(thumb_a: np.ndarray, thumb_b: np.ndarray) -> float:
+    """
+    Максимальная нормированная корреляция двух миниатюр по небольшим поворотам
+    и сдвигам. Повторная съемка страницы дает высокую корреляцию даже при
+    наклоне и обрезке кадра, разные страницы дневника — низкую.
+    """
+    m = ALIGN_MAX_SHIFT
+    windows = sliding_window_view(thumb_a, (ALIGN_SIZE - 2 * m, ALIGN_SIZE - 2 * m))
+    windows = windows - windows.mean(axis=(2, 3), keepdims=True)
+    windows_norm = np.sqrt((windows ** 2).sum(axis=(2, 3)))
+
+    image_b = Image.fromarray(thumb_b)
+    best = -1.0
+    for angle in np.arange(-ALIGN_MAX_ANGLE, ALIGN_MAX_ANGLE + 1e-9, ALIGN_ANGLE_STEP):
+        rotated = np.asarray(image_b.rotate(float(angle), resample=Image.BILINEAR), dtype=np.float64)
+        center = rotated[m:ALIGN_SIZE - m, m:ALIGN_SIZE - m]
+        center = center - center.mean()
+        denominator = windows_norm * np.sqrt((center ** 2).sum())
+        if not denominator.any():
+            continue
+        correlation = (windows * center).sum(axis=(2, 3)) / np.where(denominator > 0, denominator, np.inf)
+        best = max(best, float(correlation.max()))
+    return best
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def deduplicate_scans(
+    image_paths: list[Path], max_distance: int, min_correlation: float
+) -> list[tuple[Path, Path, list[Path]]]:
+    """
+    Находит повторные сканы одной и той же страницы.
+
+    Хэш только отсеивает заведомо разные страницы попарным сравнением расстояния
+    Хэмминга; решение о дубликате принимает совмещение миниатюр (alignment_score).
+    Группы объединяются транзитивно, поэтому результат не зависит от того, какой
+    из сканов встретился первым.
+    :param image_paths: Пути к сканам в порядке страниц.
+    :param max_distance: Максимальное расстояние Хэмминга между хэшами кандидатов.
+    :param min_correlation: Минимальная корреляция миниатюр для признания дубликатом.
+    :return: Список кортежей (скан, задающий номер страницы; самый резкий скан группы,
+             который нужно распознавать; остальные сканы группы) в исходном порядке.
+    """
+    hashes = {}
+    thumbnails = {}
+    order = {image_path: i for i, image_path in enumerate(image_paths)}
+    parent = {image_path: image_path for image_path in image_paths}
+
+    def find(image_path: Path) -> Path:
+        while parent[image_path] != image_path:
+            parent[image_path] = parent[parent[image_path]]
+            image_path = parent[image_path]
+        return image_path
+
+    for image_path in image_paths:
+        try:
+            phash = compute_phash(image_path)
+            thumbnails[image_path] = _alignment_thumbnail(image_path)
+        except Exception as e:
+            logging.error(f"Не удалось вычислить хэш для {image_path}, скан будет обработан без дедупликации: {e}")
+            continue
+
+        candidates = [p for p, other in hashes.items() if hamming_distance(phash, other) <= max_distance]
+        for candidate in candidates:
+            score = alignment_score(thumbnails[candidate], thumbnails[image_path])
+            if score >= min_correlation:
+                logging.info(f"{image_path.name} совпадает с {candidate.name} (корреляция {score:.2f})")
+                root, candidate_root = find(image_path), find(candidate)
+                # Корнем группы всегда остается скан, встретившийся раньше
+                if order[root] < order[candidate_root]:
+                    parent[candidate_root] = root
+                else:
+                    parent[root] = candidate_root
+        hashes[image_path] = phash
+
+    groups = {}
+    for image_path in image_paths:
+        groups.setdefault(find(image_path), []).append(image_path)
+
+    result = []
+    for group in groups.values():
+        if len(group) == 1:
+            result.append((group[0], group[0], []))
+            continue
+
+        sharpness = {}
+        resolution = {}
+        try:
+            size = _common_size(group)
+        except Exception as e:
+            logging.error(f"Не удалось прочитать размеры сканов {[p.name for p in group]}: {e}")
+            size = None
+        for image_path in group:
+            try:
+                sharpness[image_path] = compute_sharpness(image_path, size) if size else -1.0
+                with Image.open(image_path) as img:
+                    resolution[image_path] = img.size[0] * img.size[1]
+            except Exception as e:
+                logging.error(f"Не удалось оценить резкость {image_path}: {e}")
+                sharpness[image_path] = -1.0
+                resolution[image_path] = 0
+
+        max_sharpness = max(sharpness.values())
+        sharpest = [p for p in group if sharpness[p] >= max_sharpness - abs(max_sharpness) * SHARPNESS_TOLERANCE]
+        best_path = max(sharpest, key=lambda p: resolution[p])
+        duplicates = [p for p in group if p != best_path]
+        logging.warning(
+            f"Найдены повторные сканы страницы {group[0].name}: {', '.join(p.name for p in group)}. "
+            f"Самый резкий: {best_path.name}"
+        )
+        result.append((group[0], best_path, duplicates))
+
+    return result